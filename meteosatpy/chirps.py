@@ -1,10 +1,11 @@
 import os
 import sys
 import shutil
-import urllib.request
+import tempfile
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 from .warnings import ignoreWarnings
-from .utils import ungzip, createMask, maskTIFF, writeRaster
+from .utils import create_session, ungzip, createMask, mask_clamp_write, gdal_env
 
 
 class CHIRPS():
@@ -13,8 +14,14 @@ class CHIRPS():
     Climate Hazards Group InfraRed Precipitation with Station
     """
     def __init__(self, root:str = ".") -> None:
+        # Directory where temporal files are written
+        self.root = root
+
         # Ignore warnings produced by Fiona Deprecation
         ignoreWarnings()
+
+        # Create a persistent session for all requests
+        self.session = create_session()
     
     def download(self, date:dt.datetime, timestep:str, outpath:str, 
                  extent:list = None) -> None:
@@ -59,34 +66,58 @@ class CHIRPS():
         else:
             url = f"{server}/{product}/chirps-v2.0.{filedate}.tif"
         
-        # Download and ungzip file
-        try:
+        # Temporal files are written in a per-call directory
+        with tempfile.TemporaryDirectory(dir=self.root) as workdir:
+            tif_path = os.path.join(workdir, "temporal.tif")
+            gz_path = os.path.join(workdir, "temporal.tif.gz")
+
+            # Download file streaming in 1 MiB chunks. Gzip files are requested
+            # without content encoding, so their payload is not decoded twice
+            headers = {"Accept-Encoding": "identity"} if timestep != "annual" else None
+            try:
+                with self.session.get(url, stream=True, headers=headers) as response:
+                    response.raise_for_status()
+                    response.raw.decode_content = True
+                    with open(gz_path if timestep != "annual" else tif_path, 'wb') as f:
+                        shutil.copyfileobj(response.raw, f, length=1024*1024)
+            except Exception as e:
+                print(f"Error occurred while downloading: {e}")
+                return
+                
+            # Ungzip the file
             if timestep != "annual":
-                urllib.request.urlretrieve(url, "temporal.tif.gz")
-            else:
-                urllib.request.urlretrieve(url, "temporal.tif")     
-        except Exception as e:
-            print(f"Error occurred while downloading: {e}")
-            return
-            
-        # Ungzip the file
-        if timestep != "annual":
-            ungzip("temporal.tif.gz")
+                ungzip(gz_path)
 
-        # Mask the raster file to required extent
-        if extent is None:
-            shutil.copyfile("temporal.tif", outpath)
-        else:
-            mask = createMask(north=extent[0], south=extent[1], 
-                              east=extent[2], west=extent[3])
-            raster, meta = maskTIFF("temporal.tif", mask)
-            raster[raster<0] = 0
-            writeRaster(raster, meta, path=outpath)
-        
-        # Remove the temporal file
-        os.remove("temporal.tif")
+            # Mask the raster file to required extent
+            if extent is None:
+                shutil.move(tif_path, outpath)
+            else:
+                mask = createMask(north=extent[0], south=extent[1], 
+                                  east=extent[2], west=extent[3])
+                mask_clamp_write(tif_path, mask, out_path=outpath)
 
         # Print status mensages
         print(f"Downloaded CHIRPS {timestep} file: {date}", end='\r')
         sys.stdout.flush()
 
+    def download_batch(self, dates:list, timestep:str, outpath:str, 
+                       extent:list = None, workers:int = 8) -> None:
+        """
+        Download CHIRPS precipitation data for several dates in parallel
+
+        Args:
+            dates: A list of datetime objects representing the dates.
+            timestep: A string specifying the timestep: "daily", "monthly", "annual"
+            outpath: A string specifying the path for output files. It is 
+                     formatted with each date, e.g. "chirps_%Y-%m-%d.tif".
+            extent: An optional list specifying the extent.
+            workers: Number of parallel downloads. Default: 8
+        """
+        # Each download runs with the GDAL configuration for bulk processing
+        download = gdal_env()(self.download)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download, date, timestep, 
+                                       date.strftime(outpath), extent) 
+                       for date in dates]
+            for future in futures:
+                future.result()
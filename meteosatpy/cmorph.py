@@ -1,10 +1,11 @@
 import os
 import sys
 import shutil
-import urllib.request
+import tempfile
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 from .warnings import ignoreWarnings
-from .utils import netcdf2TIFF, createMask, maskTIFF, writeRaster
+from .utils import create_session, netcdf2TIFF, createMask, mask_clamp_write, gdal_env
 
 
 class CMORPH():
@@ -15,9 +16,15 @@ class CMORPH():
     Center (CPC) Morphing Technique (MORPH).
     """
     def __init__(self, root:str = ".") -> None:
+        # Directory where temporal files are written
+        self.root = root
+
         # Ignore warnings produced by Fiona Deprecation
         ignoreWarnings()
 
+        # Create a persistent session for all requests
+        self.session = create_session()
+
     def download(self, date:dt.datetime, timestep:str, outpath:str, 
                  extent:list = None) -> None:
         """
@@ -56,35 +63,59 @@ class CMORPH():
         else:
             path = f"daily/0.25deg/{year}/{month}/CMORPH_V1.0_ADJ_0.25deg-DLY_00Z_{df}.nc"
         
-        # Construct and download URL
+        # Construct URL
         url = f"{server}/{product}/{path}"
-        try:
-            urllib.request.urlretrieve(url, "temporal.nc")        
-        except Exception as e:
-            print(f"Error occurred while downloading: {e}")
-            return
-        
-        # Parse NC to TIFF
-        netcdf2TIFF("temporal.nc", var="cmorph", time=date.strftime("%Y-%m-%d %M:00"), 
-                    isflip=True, correction=True)
 
-        # Mask the raster file to required extent
-        if extent is None:
-            shutil.copyfile("temporal.tif", outpath)
-        else:
-            mask = createMask(north=extent[0], south=extent[1], 
-                              east=extent[2], west=extent[3])
-            raster, meta = maskTIFF("temporal.tif", mask)
-            raster[raster<0] = 0
-            writeRaster(raster, meta, path=outpath)
-        
-        # Remove the temporal file
-        os.remove("temporal.tif")
-        os.remove("temporal.nc")
+        # Temporal files are written in a per-call directory
+        with tempfile.TemporaryDirectory(dir=self.root) as workdir:
+            nc_path = os.path.join(workdir, "temporal.nc")
+            tif_path = os.path.join(workdir, "temporal.tif")
+
+            # Download file streaming in 1 MiB chunks
+            try:
+                with self.session.get(url, stream=True) as response:
+                    response.raise_for_status()
+                    response.raw.decode_content = True
+                    with open(nc_path, 'wb') as f:
+                        shutil.copyfileobj(response.raw, f, length=1024*1024)
+            except Exception as e:
+                print(f"Error occurred while downloading: {e}")
+                return
+            
+            # Parse NC to TIFF
+            netcdf2TIFF(nc_path, var="cmorph", time=date.strftime("%Y-%m-%d %M:00"), 
+                        out_path=tif_path, isflip=True, correction=True)
+
+            # Mask the raster file to required extent
+            if extent is None:
+                shutil.move(tif_path, outpath)
+            else:
+                mask = createMask(north=extent[0], south=extent[1], 
+                                  east=extent[2], west=extent[3])
+                mask_clamp_write(tif_path, mask, out_path=outpath)
 
         # Print status mensages
         print(f"Downloaded CMORPH {timestep} file: {date}", end='\r')
         sys.stdout.flush()
 
+    def download_batch(self, dates:list, timestep:str, outpath:str, 
+                       extent:list = None, workers:int = 8) -> None:
+        """
+        Download CMORPH precipitation data for several dates in parallel
 
-
+        Args:
+            dates: A list of datetime objects representing the dates/hours.
+            timestep: A string specifying the timestep: "30min", "hourly", "daily"
+            outpath: A string specifying the path for output files. It is 
+                     formatted with each date, e.g. "cmorph_%Y-%m-%d.tif".
+            extent: An optional list specifying the extent.
+            workers: Number of parallel downloads. Default: 8
+        """
+        # Each download runs with the GDAL configuration for bulk processing
+        download = gdal_env()(self.download)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download, date, timestep, 
+                                       date.strftime(outpath), extent) 
+                       for date in dates]
+            for future in futures:
+                future.result()
@@ -1,10 +1,13 @@
 import os
 import sys
+import time
 import shutil
-import requests
+import tempfile
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import MozillaCookieJar, LoadError
 from .warnings import ignoreWarnings
-from .utils import min_code, earth_data_explorer_credential, netcdf2TIFF, createMask, maskTIFF, writeRaster
+from .utils import min_code, earth_data_explorer_credential, create_session, netcdf2TIFF, createMask, mask_clamp_write, gdal_env
 
 class IMERG():
     """
@@ -17,6 +20,9 @@ class IMERG():
         pw: Password for account: NASA Earth Data Explorer
     """
     def __init__(self, user:str = None, pw:str = None, root:str = ".") -> None:
+        # Directory where temporal files are written
+        self.root = root
+
         # Ignore warnings produced by Fiona Deprecation
         ignoreWarnings()
 
@@ -25,21 +31,72 @@ class IMERG():
             err = "Username or password for Earth Data Explorer Account not provided."
             raise(err)
         
+        # Create a persistent session for all requests
+        self.session = create_session()
+        self.session.auth = (user, pw)
+
+        # Reuse the cached session cookies, login only if they expired
+        self.cookies_path = os.path.join(os.path.expanduser("~"), ".meteosatpy",
+                                         f"earthdata_{user}.cookies")
+        if not self._load_cookies():
+            self._login()
+
+    def _load_cookies(self, max_age:int = 24*3600) -> bool:
+        """
+        Load the cached Earth Data session cookies if they are fresh
+
+        Args:
+            max_age: Maximum age of the cached cookies in seconds. Default: 24h
+
+        Return:
+            Boolean, True if the cookies were loaded
+        """
+        path = self.cookies_path
+        if not os.path.exists(path) or time.time() - os.path.getmtime(path) > max_age:
+            return False
+        jar = MozillaCookieJar(path)
+        try:
+            jar.load(ignore_discard=True)
+        except (OSError, LoadError):
+            return False
+        self.session.cookies.update(jar)
+        return True
+
+    def _login(self) -> None:
+        """
+        Login to Earth Data Explorer and cache the session cookies
+        """
+        user, pw = self.session.auth
+
         # Generate Loggin
         auth_url = 'https://urs.earthdata.nasa.gov/login'
         auth_data = {'username': user, 'password': pw}
-        response = requests.post(auth_url, data=auth_data)
+        response = self.session.post(auth_url, data=auth_data)
 
         # Validate auth
         if response.status_code == 200:
             earth_data_explorer_credential(user, pw)
         else:
             err = "Invalid username or password. Please provide correct username and"
-            err = f"{err} password for Earth Data Explorer Account. {response.read()}"
-            raise(err)
-       
-        
-    
+            err = f"{err} password for Earth Data Explorer Account. {response.text}"
+            raise Exception(err)
+
+        # Cache the session cookies, readable only by the owner. They are saved
+        # to a temporal file created with mode 0600 and moved into place
+        cache_dir = os.path.dirname(self.cookies_path)
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            jar = MozillaCookieJar(tmp_path)
+            for cookie in self.session.cookies:
+                jar.set_cookie(cookie)
+            jar.save(ignore_discard=True)
+            os.replace(tmp_path, self.cookies_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
     def download(self, date:dt.datetime, version:str, run:str, timestep:str, 
                  outpath:str, extent:list = None) -> None:
         """
@@ -138,35 +195,63 @@ class IMERG():
                     raise("IMERG late- and early-run data do not include monthly information.")
 
 
-        # Download data
-        response = requests.get(url)
-        if response.status_code == 200:
-            with open("temporal.nc", 'wb') as f:
-                f.write(response.content)
-        else:
-            raise("Error occurred while downloading")
+        # Temporal files are written in a per-call directory
+        with tempfile.TemporaryDirectory(dir=self.root) as workdir:
+            nc_path = os.path.join(workdir, "temporal.nc")
+            tif_path = os.path.join(workdir, "temporal.tif")
 
-        # Parse NC to TIFF
-        print(multidim)
-        netcdf2TIFF("temporal.nc", var=var_name, time=date.strftime("%Y-%m-%d %M:00"), 
-                    multidimention = multidim, traspose = True, isflip = True)
-        
-        # Mask the raster file to required extent
-        if extent is None:
-            shutil.copyfile("temporal.tif", outpath)
-        else:
-            mask = createMask(north=extent[0], south=extent[1], 
-                              east=extent[2], west=extent[3])
-            raster, meta = maskTIFF("temporal.tif", mask)
-            raster[raster<0] = 0
-            writeRaster(raster, meta, path=outpath)
+            # Download data streaming in 1 MiB chunks, login again if the 
+            # cached session expired
+            response = self.session.get(url, stream=True)
+            if response.status_code == 401:
+                response.close()
+                self._login()
+                response = self.session.get(url, stream=True)
+            with response:
+                if response.status_code != 200:
+                    raise Exception("Error occurred while downloading")
+                response.raw.decode_content = True
+                with open(nc_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1024*1024)
 
-        # Remove the temporal file
-        os.remove("temporal.tif")
-        os.remove("temporal.nc")
+            # Parse NC to TIFF
+            print(multidim)
+            netcdf2TIFF(nc_path, var=var_name, time=date.strftime("%Y-%m-%d %M:00"), 
+                        out_path=tif_path, multidimention = multidim, traspose = True, 
+                        isflip = True)
+            
+            # Mask the raster file to required extent
+            if extent is None:
+                shutil.move(tif_path, outpath)
+            else:
+                mask = createMask(north=extent[0], south=extent[1], 
+                                  east=extent[2], west=extent[3])
+                mask_clamp_write(tif_path, mask, out_path=outpath)
 
         # Print status mensages
         print(f"Downloaded IMERG {version} {run} run {timestep} file: {date}", end='\r')
         sys.stdout.flush()
 
+    def download_batch(self, dates:list, version:str, run:str, timestep:str, 
+                       outpath:str, extent:list = None, workers:int = 8) -> None:
+        """
+        Download IMERG precipitation data for several dates in parallel
 
+        Args:
+            dates: A list of datetime objects representing the dates.
+            version: A string specifying the product version: "v06", "v07".
+            run: A string specifying the product run: "early", "late", "final".
+            timestep: A string specifying the timestep: "30min", "daily", "monthly".
+            outpath: A string specifying the path for output files. It is 
+                     formatted with each date, e.g. "imerg_%Y-%m-%d.tif".
+            extent: An optional list specifying the extent.
+            workers: Number of parallel downloads. Default: 8
+        """
+        # Each download runs with the GDAL configuration for bulk processing
+        download = gdal_env()(self.download)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download, date, version, run, timestep,
+                                       date.strftime(outpath), extent) 
+                       for date in dates]
+            for future in futures:
+                future.result()
@@ -1,9 +1,11 @@
 import os
 import sys
 import shutil
+import tempfile
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 from .warnings import ignoreWarnings
-from .utils import netcdf2TIFF, createMask, maskTIFF, writeRaster, is_installed
+from .utils import netcdf2TIFF, createMask, mask_clamp_write, is_installed, gdal_env
 
 class MSWEP():
     """
@@ -11,6 +13,9 @@ class MSWEP():
     Multi-Source Weighted-Ensemble Precipitation (MSWEP)
     """
     def __init__(self, root:str = ".") -> None:
+        # Directory where temporal files are written
+        self.root = root
+
         # Ignore warnings produced by Fiona Deprecation
         ignoreWarnings()
 
@@ -63,37 +68,55 @@ class MSWEP():
             file_name = date.strftime('%Y%m.nc')
             timestep = "Monthly"
 
-        # Construct the command and download data
-        cmd = "rclone sync -v --drive-shared-with-me GoogleDrive:/MSWEP_V280"
-        cmd = f"{cmd}/{dataset}/{timestep}/{file_name} ./"
-        outcmd = os.system(cmd)
+        # Temporal files are written in a per-call directory
+        with tempfile.TemporaryDirectory(dir=self.root) as workdir:
+            nc_path = os.path.join(workdir, file_name)
+            tif_path = os.path.join(workdir, "temporal.tif")
 
-        if not outcmd==0:
-            err = "Error occurred while downloading: No exist data for selected date"
-            raise(err)
-        else:
-            os.rename(file_name, "temporal.nc")
+            # Construct the command and download data
+            cmd = "rclone sync -v --drive-shared-with-me GoogleDrive:/MSWEP_V280"
+            cmd = f'{cmd}/{dataset}/{timestep}/{file_name} "{workdir}"'
+            outcmd = os.system(cmd)
 
-        # Parse NC to TIFF
-        netcdf2TIFF("temporal.nc", var="precipitation", time=date.strftime("%Y-%m-%d %M:00"))
+            if not outcmd==0:
+                err = "Error occurred while downloading: No exist data for selected date"
+                raise(err)
 
-        # Mask the raster file to required extent
-        if extent is None:
-            shutil.copyfile("temporal.tif", outpath)
-        else:
-            mask = createMask(north=extent[0], south=extent[1], 
-                              east=extent[2], west=extent[3])
-            raster, meta = maskTIFF("temporal.tif", mask)
-            raster[raster<0] = 0
-            writeRaster(raster, meta, path=outpath)
-        
-        # Remove the temporal file
-        os.remove("temporal.tif")
-        os.remove("temporal.nc")
+            # Parse NC to TIFF
+            netcdf2TIFF(nc_path, var="precipitation", time=date.strftime("%Y-%m-%d %M:00"),
+                        out_path=tif_path)
+
+            # Mask the raster file to required extent
+            if extent is None:
+                shutil.move(tif_path, outpath)
+            else:
+                mask = createMask(north=extent[0], south=extent[1], 
+                                  east=extent[2], west=extent[3])
+                mask_clamp_write(tif_path, mask, out_path=outpath)
 
         # Print status mensages
         print(f"Downloaded MSWEP {timestep} file: {date}", end='\r')
         sys.stdout.flush()
 
+    def download_batch(self, dates:list, timestep:str, dataset:str, outpath:str, 
+                       extent:list = None, workers:int = 8) -> None:
+        """
+        Download MSWEP precipitation data for several dates in parallel
 
-
+        Args:
+            dates: A list of datetime objects representing the dates.
+            timestep: A string specifying the timestep: "3hourly","daily", "monthly".
+            dataset: A string especifying the mswep dataset: "NTR", "Past", "Past_nogauge".
+            outpath: A string specifying the path for output files. It is 
+                     formatted with each date, e.g. "mswep_%Y-%m-%d.tif".
+            extent: An optional list specifying the extent.
+            workers: Number of parallel downloads. Default: 8
+        """
+        # Each download runs with the GDAL configuration for bulk processing
+        download = gdal_env()(self.download)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download, date, timestep, dataset,
+                                       date.strftime(outpath), extent) 
+                       for date in dates]
+            for future in futures:
+                future.result()
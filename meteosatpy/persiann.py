@@ -1,13 +1,20 @@
+import io
 import os
 import sys
 import json
 import shutil
-import requests
 import rasterio
+import tempfile
 import datetime as dt
+from rasterio.crs import CRS
+from concurrent.futures import ThreadPoolExecutor
 from zipfile import ZipFile
 from .warnings import ignoreWarnings
-from .utils import get_params_persiann, writeRaster, createMask, maskTIFF
+from .utils import get_params_persiann, create_session, createMask, mask_clamp_write, gdal_env
+
+# Downloaded archives are kept in memory up to this size in total, larger ones
+# are written to disk. Parallel downloads share it
+MAX_MEMORY_ARCHIVE = 256*1024*1024
 
 class PERSIANN():
     """
@@ -16,11 +23,17 @@ class PERSIANN():
     Neural Networks
     """
     def __init__(self, root:str = ".") -> None:
+        # Directory where temporal files are written
+        self.root = root
+
         # Ignore warnings produced by Fiona Deprecation
         ignoreWarnings()
+
+        # Create a persistent session for all requests
+        self.session = create_session()
     
     def download(self, date:dt.datetime, timestep:str, dataset:str, outpath:str, 
-                 extent:list = None) -> None:
+                 extent:list = None, max_memory:int = MAX_MEMORY_ARCHIVE) -> None:
         """
         Download PERSIANN precipitation data.
 
@@ -31,6 +44,8 @@ class PERSIANN():
             dataset (str): A string specifying the dataset: "PERSIANN", "CCS", "CDR", "PDIR".
             outpath (str): Path to store the output file.
             extent (list, optional): An optional list specifying the extent. 
+            max_memory (int, optional): Maximum size in bytes of an archive kept 
+                                        in memory. Default: 256 MiB
         """
         # Validate timestep variable
         if timestep not in ["hourly", "3hourly", "6hourly", "daily", "monthly", "annual"]:
@@ -51,7 +66,7 @@ class PERSIANN():
         params = get_params_persiann(date, timestep, dataset)
 
         # Querying PERSIANN data server
-        query = requests.get(query_url, params=params)
+        query = self.session.get(query_url, params=params)
         if query.status_code != 200:
             raise Exception('Error while querying PERSIANN data server')
         body = json.loads(query.text)
@@ -84,50 +99,73 @@ class PERSIANN():
         }
 
         # Create the request
-        gen = requests.get(gen_url, params=dparams)
+        gen = self.session.get(gen_url, params=dparams)
         if gen.status_code != 200:
             raise Exception('Error while generating download link')
 
-        # Downloading the file
-        response = requests.get(file_url, stream=True)
-        with open("temporal.zip", 'wb') as f:
-            for chunk in response.iter_content(chunk_size=2048):
-                if chunk:
-                    f.write(chunk)
-                    f.flush()
-
-        # Extracting the downloaded file
-        with ZipFile("temporal.zip", "r") as zip_ref:
-            zip_ref.extractall("temp")
-
-        # Finding and copying the TIFF file
-        tiff_file = [f for f in os.listdir("temp") if f.endswith(".tif")][0]
-        shutil.copy(os.path.join("temp", tiff_file), "temporal.tif")
-
-        # Removing temporary directory and files
-        shutil.rmtree("temp")
-        os.remove("temporal.zip")
-
-        # Reprojecting
-        with rasterio.open("temporal.tif") as src:
-            raster = src.read()
-            meta = src.meta
-        meta.update({"crs": '+proj=longlat +datum=WGS84 +no_defs +ellps=WGS84 +towgs84=0,0,0'})
-        writeRaster(raster, meta, "temporal.tif")
-
-        # Mask the raster file to required extent
-        if extent is None:
-            shutil.copyfile("temporal.tif", outpath)
-        else:
-            mask = createMask(north=extent[0], south=extent[1], 
-                              east=extent[2], west=extent[3])
-            raster, meta = maskTIFF("temporal.tif", mask)
-            raster[raster<0] = 0
-            writeRaster(raster, meta, path=outpath)
-
-        # Remove the temporal file
-        os.remove("temporal.tif")
+        # Temporal files are written in a per-call directory
+        with tempfile.TemporaryDirectory(dir=self.root) as workdir:
+            zip_path = os.path.join(workdir, "temporal.zip")
+            tif_path = os.path.join(workdir, "temporal.tif")
+
+            # Downloading the file streaming in 1 MiB chunks. Archives up to 
+            # max_memory bytes are kept in memory, larger ones are written to disk
+            with self.session.get(file_url, stream=True) as response:
+                response.raw.decode_content = True
+                size = int(response.headers.get("Content-Length", 0))
+                if 0 < size <= max_memory:
+                    archive = io.BytesIO()
+                    shutil.copyfileobj(response.raw, archive, length=1024*1024)
+                else:
+                    archive = zip_path
+                    with open(zip_path, 'wb') as f:
+                        shutil.copyfileobj(response.raw, f, length=1024*1024)
+
+            # Extracting the TIFF file straight from the downloaded file
+            with ZipFile(archive, "r") as zip_ref:
+                tiff_file = next(n for n in zip_ref.namelist() if n.endswith(".tif"))
+                with zip_ref.open(tiff_file) as f_in, open(tif_path, 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, length=1024*1024)
+
+            # PERSIANN rasters are distributed without projection
+            crs = CRS.from_proj4('+proj=longlat +datum=WGS84 +no_defs +ellps=WGS84 +towgs84=0,0,0')
+
+            # Mask the raster file to required extent
+            if extent is None:
+                with rasterio.open(tif_path, "r+") as src:
+                    src.crs = crs
+                shutil.move(tif_path, outpath)
+            else:
+                mask = createMask(north=extent[0], south=extent[1], 
+                                  east=extent[2], west=extent[3])
+                mask_clamp_write(tif_path, mask, out_path=outpath, crs=crs)
 
         # Print status mensages
         print(f"Downloaded PERSIANN {dataset} {timestep} file: {date}", end='\r')
         sys.stdout.flush()
+
+    def download_batch(self, dates:list, timestep:str, dataset:str, outpath:str, 
+                       extent:list = None, workers:int = 8) -> None:
+        """
+        Download PERSIANN precipitation data for several dates in parallel.
+
+        Args:
+            dates (list): A list of datetime objects representing the dates.
+            timestep (str): A string specifying the timestep: "hourly", "3hourly", "6hourly", 
+                            "daily", "monthly", "annual".
+            dataset (str): A string specifying the dataset: "PERSIANN", "CCS", "CDR", "PDIR".
+            outpath (str): Path to store the output files. It is formatted with each 
+                           date, e.g. "persiann_%Y-%m-%d.tif".
+            extent (list, optional): An optional list specifying the extent. 
+            workers (int, optional): Number of parallel downloads. Default: 8
+        """
+        # Each download runs with the GDAL configuration for bulk processing.
+        # Workers share the memory for archives, at most MAX_MEMORY_ARCHIVE
+        download = gdal_env()(self.download)
+        max_memory = MAX_MEMORY_ARCHIVE // workers
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(download, date, timestep, dataset,
+                                       date.strftime(outpath), extent, max_memory) 
+                       for date in dates]
+            for future in futures:
+                future.result()
@@ -1,19 +1,44 @@
 import os
-import gzip
 import shutil
 import xarray
 import platform
 import rasterio
-import subprocess
+import requests
 import numpy as np
-import geopandas as gpd
-from rasterio.mask import mask
+from contextlib import contextmanager
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.features import geometry_mask, geometry_window
 from rasterio.transform import from_origin
+from rasterio.warp import transform_geom
+from rasterio.windows import Window
+from shapely.geometry import box
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Buffer size used to stream decompressed data, as the gzip module does
+READ_BUFFER_SIZE = 128*1024
+
+# Use the ISA-L accelerated gzip implementation when available
+try:
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
+
+# Use parallel gzip decompression for large files when available. Files
+# smaller than PARALLEL_GZIP_MIN_SIZE are faster to decompress serially
+PARALLEL_GZIP_MIN_SIZE = 32*1024*1024
+try:
+    import rapidgzip
+except ImportError:
+    rapidgzip = None
 
 
 def ungzip(path:str, remove:bool = True) -> None:
     """
-    Unzip file with extension gz and remove it
+    Unzip file with extension gz and remove it. Large files are decompressed 
+    in parallel if rapidgzip is installed, with best speedup on archives 
+    produced by pigz.
     
     Args:
         path: File path to unzip (type text)
@@ -22,10 +47,15 @@ def ungzip(path:str, remove:bool = True) -> None:
     # Remove the extension
     ungzip_path = path.replace(".gz", "")
 
-    # Ungzip the file
-    with gzip.open(path, 'rb') as f_in:
-        with open(ungzip_path, 'wb') as f_out:
-            f_out.write(f_in.read())
+    # Open the file, using parallel decompression for large files
+    if rapidgzip is not None and os.path.getsize(path) > PARALLEL_GZIP_MIN_SIZE:
+        f_in = rapidgzip.open(path, parallelization=0)
+    else:
+        f_in = gzip.open(path, 'rb')
+
+    # Ungzip the file streaming in READ_BUFFER_SIZE chunks
+    with f_in, open(ungzip_path, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out, length=READ_BUFFER_SIZE)
 
     # Remove the gzip file if required
     if(remove):
@@ -34,7 +64,7 @@ def ungzip(path:str, remove:bool = True) -> None:
 
 
 def createMask(north:float, south:float, east:float, west:float, 
-               epsg:int = 4326) -> gpd.GeoDataFrame:
+               epsg:int = 4326) -> tuple:
     """
     Create the mask for area clipping
     
@@ -46,36 +76,57 @@ def createMask(north:float, south:float, east:float, west:float,
         epsg:  SRC coordinate projection. Default: 4326
 
     Return:
-        gdf: a geopandas dataframe with the mask
+        tuple (two elements):
+            geoms: a list with the rectangular polygon of the mask
+            crs: the coordinate reference system (CRS) of the mask
     """
-    # Create a GeoDataFrame with a single rectangular polygon
-    gdf = gpd.GeoDataFrame(geometry=[
-                gpd.polygon.Polygon([
-                    (west, south), (east, south), 
-                    (east, north), (west, north)])])
-    # Set the coordinate reference system (CRS)
-    gdf.crs = f"EPSG:{epsg}"
-    return gdf
+    return([box(west, south, east, north)], CRS.from_epsg(epsg))
 
 
 
-def maskTIFF(path:str, shp:gpd.GeoDataFrame) -> tuple:
+def maskGeometries(shp:tuple, crs) -> list:
+    """
+    Get the mask geometries in the coordinate reference system of a raster
+    
+    Args:
+        shp: A tuple with the geometries and their CRS, see createMask
+        crs: Coordinate reference system of the raster
+
+    Return:
+        geoms: a list with the geometries of the mask
+    """
+    geoms, shp_crs = shp
+    if crs is not None and crs != shp_crs:
+        geoms = [transform_geom(shp_crs, crs, geom) for geom in geoms]
+    return geoms
+
+
+
+def maskTIFF(path:str, shp:tuple, nodata:float = None) -> tuple:
     """
     Creates a masked GeoTIFF using input shapes. Pixels are masked or set 
     to nodata outside the input shapes.
     
     Args:
         path: Raster path to which the mask will be applied
-        shp: A geopandas dataframe with iterable geometries
+        shp: A tuple with the geometries and their CRS, see createMask
+        nodata: Value assigned to pixels outside the input shapes. Default: 
+                the raster nodata value or 0
 
     Return:
         tuple (two elements):
             out_image: Data contained in the raster after applying the mask.
             out_meta: Information for mapping pixel coordinates in masked
     """
-    # Read the file and crop to target area
+    # Read only the window of the target area and mask it
     with rasterio.open(path) as src:
-        out_image, out_transform = mask(src, shp.geometry, crop=True)
+        geoms = maskGeometries(shp, src.crs)
+        window = geometry_window(src, geoms)
+        out_image = src.read(window=window)
+        out_transform = src.window_transform(window)
+        outside = geometry_mask(geoms, out_shape=out_image.shape[1:], 
+                                transform=out_transform)
+        out_image[:, outside] = (src.nodata or 0) if nodata is None else nodata
         out_meta = src.meta
 
     # Update the metadata of GeoTIFF file
@@ -89,17 +140,128 @@ def maskTIFF(path:str, shp:gpd.GeoDataFrame) -> tuple:
 
 
 
-def writeRaster(raster, meta, path:str) -> None:
+@contextmanager
+def gdal_env(**options):
     """
-    Write a raster file
+    GDAL configuration for bulk raster processing, with a 512 MB block cache 
+    and multithreaded compression. Wrap loops over many files with it, e.g.
+    `with gdal_env(): ...`, so the configuration and cache are reused.
+    
+    Args:
+        options: Additional GDAL configuration options
+    """
+    with rasterio.Env(GDAL_CACHEMAX=512, GDAL_NUM_THREADS="ALL_CPUS", 
+                      GDAL_TIFF_INTERNAL_MASK=True, **options) as env:
+        yield env
+
+
+
+def tiledMeta(meta:dict) -> dict:
+    """
+    Update raster metadata to write a tiled GeoTIFF compressed with DEFLATE
+    using all CPUs
+    
+    Args:
+        meta: Information for mapping pixel coordinates of the raster
+
+    Return:
+        meta: a copy of the metadata with the tiling and compression options
+    """
+    meta = meta.copy()
+    meta.update({
+        "driver": "GTiff",
+        "tiled": True,
+        "blockxsize": 512,
+        "blockysize": 512,
+        "compress": "deflate",
+        "predictor": 3 if str(meta["dtype"]).startswith("float") else 2,
+        "num_threads": "ALL_CPUS",
+        "BIGTIFF": "IF_SAFER"
+    })
+    return meta
+
+
+
+def writeRaster(raster, meta, path:str, overviews:bool = False) -> None:
+    """
+    Write a raster file as tiled GeoTIFF compressed with DEFLATE
     
     Args:
         raster: Data contained in the raster to be written.
         meta: Information for mapping pixel coordinates of the raster
         path: Fle path to write
+        overviews: Boolean required if you want to build overviews
     """
-    with rasterio.open(path, "w", **meta) as r:
+    with rasterio.open(path, "w", **tiledMeta(meta)) as r:
         r.write(raster)
+        if overviews:
+            r.build_overviews([2, 4, 8, 16], Resampling.average)
+            r.update_tags(ns='rio_overview', resampling='average')
+
+
+
+def clamp_nonneg(raster:np.ndarray) -> np.ndarray:
+    """
+    Replace the negative values of a raster with zero, in place and in a 
+    single vectorized pass. NaN values are kept.
+    
+    Args:
+        raster: Data contained in the raster.
+
+    Return:
+        raster: the same array after clamping
+    """
+    np.maximum(raster, 0, out=raster)
+    return raster
+
+
+
+def mask_clamp_write(in_path:str, shp:tuple, out_path:str, 
+                     nodata:float = 0, crs = None) -> None:
+    """
+    Clip a raster to the input shapes, replace negative values with zero and 
+    write the result. The raster is processed in bands of one row of output 
+    tiles, so only one band is held in memory at a time.
+    
+    Args:
+        in_path: Raster path to which the mask will be applied
+        shp: A tuple with the geometries and their CRS, see createMask
+        out_path: File path to write
+        nodata: Value assigned to pixels outside the input shapes
+        crs: Optional coordinate reference system of the raster, for rasters 
+             without it or with a wrong one. Default: the raster CRS
+    """
+    with rasterio.open(in_path) as src:
+        # Compute the window covering the shapes within the raster extent
+        crs = src.crs if crs is None else CRS.from_user_input(crs)
+        geoms = maskGeometries(shp, crs)
+        window = geometry_window(src, geoms)
+
+        # Update the metadata of GeoTIFF file
+        meta = tiledMeta(src.meta)
+        meta.update({
+            "crs": crs,
+            "height": window.height,
+            "width": window.width,
+            "transform": src.window_transform(window)
+        })
+
+        # Rasterize the shapes once for the whole window
+        outside = geometry_mask(geoms, 
+                                out_shape=(window.height, window.width), 
+                                transform=meta["transform"])
+
+        # Read, mask, clamp and write the window in bands of one row of tiles
+        band_rows = meta["blockysize"]
+        with rasterio.open(out_path, "w", **meta) as dst:
+            for row in range(0, window.height, band_rows):
+                rows = min(band_rows, window.height - row)
+                raster = src.read(window=Window(window.col_off, 
+                                                window.row_off + row,
+                                                window.width, rows))
+                raster[:, outside[row:row + rows]] = nodata
+                clamp_nonneg(raster)
+                dst.write(raster, window=Window(0, row, window.width, rows))
 
 
 
@@ -122,56 +284,108 @@ def netcdf2TIFF(path:str, var:str, time:str, out_path:str = None, isflip:bool =
     if out_path==None:
         out_path = path.replace(".nc", ".tif")
 
-    # Read the netcdf file
-    ds = xarray.open_dataset(path)
-    ds = ds.sel(time=time)
+    netcdf2TIFF_batch(path, var, [time], [out_path], isflip=isflip, 
+                      correction=correction, multidimention=multidimention,
+                      traspose=traspose)
+
 
-    # Extract data
-    data = ds[var].values
-    if multidimention:
-        data = data[0]
+
+def netcdf2TIFF_batch(path:str, var:str, times:list, out_paths:list, 
+                      isflip:bool = False, correction:bool = False, 
+                      multidimention:bool = False, traspose:bool = False) -> None:
+    """
+    Parse several timestamps of a netcdf file to GeoTIFF, opening the file 
+    only once
     
-    # Extract coordinates
-    lat = ds['lat'].values
-    lon = ds['lon'].values
-
-    # Compute the spatial resolution
-    res_lat = abs(lat[1] - lat[0])
-    res_lon = abs(lon[1] - lon[0])
-
-    # Compute the spatial tranformation
-    lon_min = lon.min() - res_lon/2
-    lat_max = lat.max() + res_lat/2
-
-    # Traspose
-    if traspose:
-        data = np.transpose(data)
-
-    # Correction
-    if correction:
-        mcd = data.shape[1] // 2
-        data = np.hstack((data[:, mcd:], data[:, :mcd]))
-        lon_min = lon_min - 180
-
-    # Flipping the image upright in the axis = 0 i.e., vertically
-    if isflip:
-        data = np.flip(data,0)
+    Args:
+        path: File path of the netcdf file
+        var: Selected variable to write in the GeoTIFF files
+        times: Selected timestamps (yyyy-mm-dd HH:MM) to write in the GeoTIFF
+        out_paths: Paths where GeoTIFF will be write, one for each timestamp.
+        isflip: 
+        correction: Conditional to data correction for CMORPH case
+        multidim: Coditional, file contains aditional dimensions. For IMERG.
+    """
+    # Read the netcdf file. Data are loaded lazily, band by band, and the file
+    # is closed even if writing fails, e.g. when a timestamp is not found
+    with xarray.open_dataset(path, cache=False) as ds:
+        # Extract coordinates, only the first, second and last values are needed
+        lat0, lat1, latn = (float(ds['lat'][i]) for i in (0, 1, -1))
+        lon0, lon1, lonn = (float(ds['lon'][i]) for i in (0, 1, -1))
+
+        # Compute the spatial resolution
+        res_lat = abs(lat1 - lat0)
+        res_lon = abs(lon1 - lon0)
+
+        # Compute the spatial tranformation, coordinates are monotonic
+        lon_min = min(lon0, lonn) - res_lon/2
+        lat_max = max(lat0, latn) + res_lat/2
+
+        # Raster dimensions considering traspose
+        shape = ds[var].shape[-2:]
+        if traspose:
+            width, height = shape
+        else:
+            height, width = shape
+
+        # Correction
+        if correction:
+            mcd = width // 2
+            lon_min = lon_min - 180
     
-    # Transform the projection considering correction
-    transform = from_origin(lon_min, lat_max, res_lon, res_lat)
-
-    # Raster metadata
-    meta = {"driver": "GTiff", 
-            "height": data.shape[0],
-            "width": data.shape[1],
-            "transform": transform,
-            "crs": '+proj=longlat +datum=WGS84 +no_defs +ellps=WGS84 +towgs84=0,0,0',
-            "count" : 1, 
-            "dtype" :str(data.dtype)}
+        # Transform the projection considering correction
+        transform = from_origin(lon_min, lat_max, res_lon, res_lat)
+
+        # Raster metadata
+        meta = tiledMeta({"driver": "GTiff", 
+                          "height": height,
+                          "width": width,
+                          "transform": transform,
+                          "crs": '+proj=longlat +datum=WGS84 +no_defs +ellps=WGS84 +towgs84=0,0,0',
+                          "count" : 1, 
+                          "dtype" :str(ds[var].dtype)})
+
+        # Bands are as high as the tiles, so each band fills whole tiles. Their
+        # buffer for flipping or correction is reused across bands and times
+        band_rows = meta["blockysize"]
+        buffer = None
+
+        with gdal_env():
+            for time, out_path in zip(times, out_paths):
+                # Extract data, only the selected variable and timestamp
+                data = ds[var].sel(time=time)
+                if multidimention:
+                    data = data[0]
     
-    # Save data as GeoTIFF file
-    with rasterio.open(out_path, 'w', **meta) as dst:
-        dst.write(data, 1)
+                # Save data as GeoTIFF file in bands of one row of tiles
+                with rasterio.open(out_path, 'w', **meta) as dst:
+                    for row in range(0, height, band_rows):
+                        rows = min(band_rows, height - row)
+
+                        # Read the band, its rows come from the bottom if it is flipped
+                        start = height - row - rows if isflip else row
+                        if traspose:
+                            band = np.transpose(data[:, start:start + rows].values)
+                        else:
+                            band = data[start:start + rows].values
+
+                        # Flipping the band upright in the axis = 0 i.e., vertically, 
+                        # and swapping its halves for correction, in a single pass
+                        if isflip or correction:
+                            order = slice(None, None, -1) if isflip else slice(None)
+                            if buffer is None:
+                                buffer = np.empty((min(band_rows, height), width), 
+                                                  dtype=band.dtype)
+                            out = buffer[:rows]
+                            if correction:
+                                out[:, :width - mcd] = band[order, mcd:]
+                                out[:, width - mcd:] = band[order, :mcd]
+                            else:
+                                out[:] = band[order]
+                            band = out
+
+                        dst.write(np.ascontiguousarray(band), 1, 
+                                  window=Window(0, row, width, rows))
 
 
 def is_installed(program):
@@ -181,20 +395,14 @@ def is_installed(program):
     Args:
         program: name of the program
     """
-    try:
-        subprocess.check_output([program, '--version'])
-        return True
-    except FileNotFoundError:
-        return False
-    except subprocess.CalledProcessError:
-        return True 
+    return shutil.which(program) is not None
     
 
+# Codes of the minutes of the day, zero padded to four digits
+MIN_CODES = [str(i).zfill(4) for i in range(24*60)]
+
 def min_code(date):
-    hora = date.hour
-    minuto = date.minute
-    codigo = hora * 60 + minuto
-    return f"{codigo:04d}"
+    return MIN_CODES[date.hour * 60 + date.minute]
 
 
 
@@ -205,31 +413,54 @@ def earth_data_explorer_credential(username, password):
     # Determine the root directory
     homeDir = os.path.expanduser("~") + os.sep
 
-    # Write files
-    with open(homeDir + '.netrc', 'w') as file:
+    # Write files, .netrc is created readable only by the owner
+    fd = os.open(homeDir + '.netrc', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    if hasattr(os, "fchmod"):
+        os.fchmod(fd, 0o600)
+    with os.fdopen(fd, 'w') as file:
         file.write('machine {} login {} password {}'.format(urs, username, password))
-        file.close()
     with open(homeDir + '.urs_cookies', 'w') as file:
         file.write('')
-        file.close()
     with open(homeDir + '.dodsrc', 'w') as file:
         file.write('HTTP.COOKIEJAR={}.urs_cookies\n'.format(homeDir))
         file.write('HTTP.NETRC={}.netrc'.format(homeDir))
-        file.close()
 
     print('Saved .netrc, .urs_cookies, and .dodsrc to:', homeDir)
 
-    # Set appropriate permissions for Linux/macOS
-    if platform.system() != "Windows":
-        subprocess.Popen('chmod og-rw ~/.netrc', shell=True)
-    else:
-        # Copy dodsrc to working directory in Windows  
-        shutil.copy2(homeDir + '.dodsrc', os.getcwd())
+    # Link dodsrc to working directory in Windows, copy it if the filesystem
+    # does not support hard links
+    if platform.system() == "Windows":
+        dodsrc = os.path.join(os.getcwd(), '.dodsrc')
+        if not (os.path.exists(dodsrc) and os.path.samefile(homeDir + '.dodsrc', dodsrc)):
+            try:
+                if os.path.exists(dodsrc):
+                    os.remove(dodsrc)
+                os.link(homeDir + '.dodsrc', dodsrc)
+            except OSError:
+                shutil.copy2(homeDir + '.dodsrc', dodsrc)
         print('Copied .dodsrc to:', os.getcwd())
 
 
 
 
+def create_session() -> requests.Session:
+    """
+    Create a HTTP session that reuses connections (keep-alive) across 
+    requests and retries failed requests
+
+    Return:
+        session: a requests session with the pooled adapter mounted
+    """
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                          max_retries=Retry(total=3, backoff_factor=0.5))
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+
+
 def get_params_persiann(date, timestep, data_type):
     """
     Get parameters for PERSIANN data download based on date, timestep, and data type.
@@ -19,7 +19,8 @@ DESCRIPTION = 'Library designed for downloading and managing meteorological data
 LONG_DESCRIPTION = (HERE / "README.md").read_text(encoding='utf-8')
 LONG_DESC_TYPE = "text/markdown"
 
-INSTALL_REQUIRES = ["rasterio", "xarray", "geopandas", "requests"]
+INSTALL_REQUIRES = ["rasterio", "xarray", "shapely", "requests"]
+EXTRAS_REQUIRE = {"speedups": ["isal", "rapidgzip"]}
 
 setup(
     name=PACKAGE_NAME,
@@ -31,6 +32,7 @@ setup(
     author_email=AUTHOR_EMAIL,
     url=URL,
     install_requires=INSTALL_REQUIRES,
+    extras_require=EXTRAS_REQUIRE,
     license=LICENSE,
     packages=find_packages(),
     include_package_data=True,